@@ -1,9 +1,15 @@
+import hashlib
+import io
 import os
+import posixpath
 import zipfile
 import shutil
 import re
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from html import unescape
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import lxml.html
+from lxml import etree
 import requests
 
 # --------------------------------------------------
@@ -12,7 +18,7 @@ import requests
 
 INPUT_EPUB = "input/economist.epub"
 
-ALLOWED_SECTIONS = {
+ALLOWED_SECTIONS = frozenset({
     "leaders", 
     "by invitation", 
     "briefing", 
@@ -26,13 +32,77 @@ ALLOWED_SECTIONS = {
     "technology quarterly",
     "essay",
     "the economist reads"
+})
+
+# 预编译的正则 (避免每次调用时重复查找/编译)
+DATE_RE = re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(?:st|nd|rd|th)?\s+20\d{2}', re.IGNORECASE)
+NON_SLUG_RE = re.compile(r"[^\w\s-]")
+HEADING_TAG_RE = re.compile(rb"<h[12][\s/>]", re.IGNORECASE)
+TAG_RE = re.compile(r"<[^>]+>")
+# class 关键字匹配 (子串、忽略大小写)，一次正则搜索代替逐个关键字 in 判断
+SECTION_CLASS_RE = re.compile(r"section|department|part|header", re.IGNORECASE)
+RUBRIC_CLASS_RE = re.compile(r"rubric|kicker|teaser|flytitle|deck|subhead", re.IGNORECASE)
+
+# 文章页共用的样式，只写一次到 output/article.css，各文章页通过 <link> 引用 (浏览器可缓存)
+ARTICLE_CSS = """body { max-width: 800px; margin: 0 auto; padding: 30px 20px; font-family: Georgia, serif; background-color: #fdfdfd; color: #111; line-height: 1.6; }
+img { max-width: 100%; height: auto; display: block; margin: 25px auto; }
+.fly-title { 
+    font-size: 0.95em; 
+    color: #e3120b; 
+    margin-bottom: 15px;
+    border-bottom: 1px solid #ddd;
+    padding-bottom: 8px;
+    font-family: sans-serif;
+    font-weight: bold;
 }
+h1 { font-size: 2.2em; line-height: 1.2; margin: 20px 0; color: #000; }
+"""
+
+# 文章页骨架，模块加载时构造一次，每篇只做三处替换
+ARTICLE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}</title>
+{css_link}
+<link rel="stylesheet" href="../article.css" type="text/css"/>
+</head>
+<body class="article">
+<div class="main-content">{body}</div>
+</body>
+</html>"""
+
+# 共享的 lxml 解析器：EPUB 内的 XHTML 一律按 UTF-8 解码，省去编码探测；每个进程构造一次
+HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# 目录页 <h1> 之前的固定部分 (含样式)，作为常量直接拼接，不再每次经 f-string 格式化
+INDEX_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>The Economist</title>
+<style>
+    body { font-family: sans-serif; max-width: 750px; margin: 0 auto; padding: 20px; background-color: #f8f9fa; }
+    h1 { text-align: center; color: #e3120b; font-family: Georgia, serif; margin-bottom: 40px; font-size: 2.4em; }
+    .edition-date { display: block; font-size: 0.6em; color: #666; margin-top: 10px; font-weight: normal; }
+    h2.section-header { background: #2c2c2c; color: #fff; padding: 12px 15px; margin-top: 50px; font-size: 1.2em; text-transform: uppercase; border-radius: 4px; }
+    div.article-link { margin: 12px 0; padding: 20px; background: #fff; border-radius: 4px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); border-left: 5px solid transparent; }
+    div.article-link:hover { border-left-color: #e3120b; transform: translateY(-2px); }
+    a { text-decoration: none; color: #111; font-weight: bold; font-size: 1.15em; display: block; }
+</style>
+</head>
+<body>
+"""
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp")
+
+AD_MARKERS = ("优质App推荐".encode("utf-8"), "优质 App 推荐".encode("utf-8"))
 
 def main():
     # 环境初始化
-    shutil.rmtree("temp_epub", ignore_errors=True)
     shutil.rmtree("output", ignore_errors=True)
-    os.makedirs("temp_epub", exist_ok=True)
     os.makedirs("output/articles", exist_ok=True)
     os.makedirs("output/images", exist_ok=True)
     os.makedirs("output/css", exist_ok=True)
@@ -41,32 +111,44 @@ def main():
         print(f"Error: {INPUT_EPUB} not found.")
         return
 
-    # 1. 解压 EPUB
-    unzip_epub()
+    # 1. 读入 EPUB (所有成员留在内存，不再解压到 temp_epub 再读回)
+    epub = load_epub(INPUT_EPUB)
 
     # 2. 【新增针对性修改】删除广告页逻辑
-    remove_ads_from_epub("temp_epub")
+    remove_ads_from_epub(epub)
 
     # 3. 【新增针对性修改】重新打包干净的 EPUB 覆盖原文件，供后续推送
-    repack_epub("temp_epub", INPUT_EPUB)
+    repack_epub(epub, INPUT_EPUB)
 
-    # 4. 后续生成网页逻辑 (保持原样)
-    copy_images()
-    css_filename = copy_css()
-    ordered_files = get_reading_order("temp_epub")
-    edition_date = extract_edition_date("temp_epub", ordered_files)
+    # 4. 写出图片与样式，按阅读顺序解析并生成网页
+    copy_images(epub)
+    css_filename = copy_css(epub)
+    write_output("output/article.css", ARTICLE_CSS)
+    ordered_files = get_reading_order(epub)
+    edition_date = extract_edition_date(epub, ordered_files)
 
     articles = []
     current_section = "Unknown" 
-
-    for html_file in ordered_files:
-        full_path = os.path.join("temp_epub", html_file)
-        if not os.path.exists(full_path): continue
-        new_articles, current_section = parse_html_file(full_path, current_section, css_filename)
-        for art in new_articles:
-            if art['section'].strip().lower() in ALLOWED_SECTIONS:
-                articles.append(art)
-
+    slug_counts = {}
+    seen_bodies = set()
+
+    # 没有任何 <h1>/<h2> 的文件 (封面、目录等) 既不产出文章也不改变栏目，按字节预筛掉，免去整页解析
+    html_docs = [epub[f] for f in ordered_files if f in epub and HEADING_TAG_RE.search(epub[f])]
+
+    # 解析是 CPU 密集且各文件独立，放到多进程；栏目/Rubric 状态跨文件延续，按阅读顺序串行回放
+    # 文件很少时进程池的启动开销不划算，直接串行
+    if len(html_docs) < 4:
+        parsed_files = [parse_html_file(d) for d in html_docs]
+    else:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            parsed_files = list(pool.map(parse_html_file, html_docs, chunksize=4))
+
+    for events in parsed_files:
+        new_articles, current_section = build_articles(events, current_section, css_filename, slug_counts, seen_bodies)
+        articles.extend(new_articles)
+
+    # 文章页统一交给线程池并发写出
+    write_files([(f"output/{a['path']}", a["html"].encode("utf-8")) for a in articles])
     generate_index(articles, edition_date)
     print(f"✅ Done. Generated {len(articles)} articles.")
     
@@ -77,41 +159,30 @@ def main():
 # 新增功能：广告页清洗与重新打包
 # --------------------------------------------------
 
-def remove_ads_from_epub(base_dir):
+def remove_ads_from_epub(epub):
     """扫描并删除包含广告关键词的 HTML 页面"""
     print("🛡️ Scanning for ad pages...")
     removed_any = False
-    for root, _, files in os.walk(base_dir):
-        for f in files:
-            if f.lower().endswith((".html", ".xhtml")):
-                file_path = os.path.join(root, f)
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as fr:
-                        content = fr.read()
-                        # 针对性匹配“优质App推荐”
-                        if "优质App推荐" in content or "优质 App 推荐" in content:
-                            print(f"🗑️ Found and removing ad page: {f}")
-                            os.remove(file_path)
-                            removed_any = True
-                except:
-                    continue
+    for name in list(epub):
+        if name.lower().endswith((".html", ".xhtml")):
+            content = epub[name]
+            # 针对性匹配“优质App推荐” (直接在字节上查找，无需先解码)
+            if AD_MARKERS[0] in content or AD_MARKERS[1] in content:
+                print(f"🗑️ Found and removing ad page: {posixpath.basename(name)}")
+                del epub[name]
+                removed_any = True
     
     if removed_any:
         # 如果删除了文件，必须清理 OPF 引用，否则 EPUB 会损坏
-        clean_opf_references(base_dir)
+        clean_opf_references(epub)
 
-def clean_opf_references(base_dir):
+def clean_opf_references(epub):
     """从 content.opf 中注销已删除的文件引用"""
-    opf_path = None
-    for root, _, files in os.walk(base_dir):
-        for f in files:
-            if f.endswith(".opf"):
-                opf_path = os.path.join(root, f)
-                break
-    if not opf_path: return
+    opf_name = find_opf(epub)
+    if not opf_name: return
 
     ET.register_namespace('', "http://www.idpf.org/2007/opf")
-    tree = ET.parse(opf_path)
+    tree = ET.ElementTree(ET.fromstring(epub[opf_name]))
     root_node = tree.getroot()
     ns = {'opf': 'http://www.idpf.org/2007/opf'}
 
@@ -120,12 +191,11 @@ def clean_opf_references(base_dir):
     if manifest is None: manifest = root_node.find("manifest")
     
     deleted_ids = []
-    opf_dir = os.path.dirname(opf_path)
+    opf_dir = posixpath.dirname(opf_name)
     
     for item in list(manifest):
         href = item.get("href")
-        full_href_path = os.path.abspath(os.path.join(opf_dir, href))
-        if not os.path.exists(full_href_path):
+        if posixpath.normpath(posixpath.join(opf_dir, href)) not in epub:
             deleted_ids.append(item.get("id"))
             manifest.remove(item)
 
@@ -136,17 +206,16 @@ def clean_opf_references(base_dir):
         if itemref.get("idref") in deleted_ids:
             spine.remove(itemref)
 
-    tree.write(opf_path, encoding="utf-8", xml_declaration=True)
+    buf = io.BytesIO()
+    tree.write(buf, encoding="utf-8", xml_declaration=True)
+    epub[opf_name] = buf.getvalue()
     print("✨ EPUB manifest references cleaned.")
 
-def repack_epub(source_dir, output_file):
-    """将修改后的文件夹重新压成 EPUB 格式"""
+def repack_epub(epub, output_file):
+    """将清洗后的成员按原顺序重新压成 EPUB 格式 (mimetype 按规范不压缩存储)"""
     with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as z:
-        for root, _, files in os.walk(source_dir):
-            for f in files:
-                abs_path = os.path.join(root, f)
-                rel_path = os.path.relpath(abs_path, source_dir)
-                z.write(abs_path, rel_path)
+        for name, data in epub.items():
+            z.writestr(name, data, compress_type=zipfile.ZIP_STORED if name == "mimetype" else None)
     print(f"📦 Repacked clean EPUB to {output_file}")
 
 # --------------------------------------------------
@@ -163,7 +232,7 @@ def upload_to_nextcloud(local_file, edition_date):
         return
 
     base_url = nc_url.strip().rstrip('/')
-    clean_date = re.sub(r'[^\w\s-]', '', edition_date).replace(' ', '_') if edition_date else "latest"
+    clean_date = NON_SLUG_RE.sub('', edition_date).replace(' ', '_') if edition_date else "latest"
     remote_file_name = f"The_Economist_{clean_date}.epub"
     target_url = f"{base_url}/Economist/{remote_file_name}"
     
@@ -196,205 +265,235 @@ def upload_to_nextcloud(local_file, edition_date):
         print(f"❌ Network/Request Error: {str(e)}")
 
 # --------------------------------------------------
-# 基础解析功能 (完全保留你的原始代码)
+# EPUB 读取、解析与网页生成
 # --------------------------------------------------
 
-def unzip_epub():
-    with zipfile.ZipFile(INPUT_EPUB, "r") as z: z.extractall("temp_epub")
-
-def copy_images():
-    for root, _, files in os.walk("temp_epub"):
-        for f in files:
-            if f.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp")):
-                shutil.copy2(os.path.join(root, f), os.path.join("output/images", f))
-
-def copy_css():
+def load_epub(path):
+    """一次性读入 EPUB 的全部文件成员：{成员名: bytes}，保持压缩包内原有顺序"""
+    with zipfile.ZipFile(path, "r") as z:
+        return {info.filename: z.read(info) for info in z.infolist() if not info.is_dir()}
+
+def find_opf(epub):
+    for name in epub:
+        if name.endswith(".opf"): return name
+    return None
+
+def copy_images(epub):
+    # 同名图片仍是后者覆盖前者：先按目标路径去重，再并发写出
+    outputs = {}
+    for name, data in epub.items():
+        if name.lower().endswith(IMAGE_EXTS):
+            outputs[os.path.join("output/images", posixpath.basename(name))] = data
+    write_files(outputs.items())
+
+def write_files(items):
+    """用线程池并发写出 (路径, bytes)；文件写入会释放 GIL"""
+    def write_one(item):
+        path, data = item
+        with open(path, "wb") as f: f.write(data)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write_one, items))
+
+def copy_css(epub):
     css_name = None
-    for root, _, files in os.walk("temp_epub"):
-        for f in files:
-            if f.lower().endswith(".css"):
-                shutil.copy2(os.path.join(root, f), os.path.join("output/css", f))
-                css_name = f
+    for name, data in epub.items():
+        if name.lower().endswith(".css"):
+            css_name = posixpath.basename(name)
+            with open(os.path.join("output/css", css_name), "wb") as f: f.write(data)
     return css_name
 
-def get_reading_order(base_dir):
-    opf_path = None
-    for root, _, files in os.walk(base_dir):
-        for f in files:
-            if f.endswith(".opf"):
-                opf_path = os.path.join(root, f)
-                break
-        if opf_path: break
-    if not opf_path: return []
+def get_reading_order(epub):
+    opf_name = find_opf(epub)
+    if not opf_name: return []
     try:
-        tree = ET.parse(opf_path)
-        root = tree.getroot()
-        ns = {'opf': 'http://www.idpf.org/2007/opf'}
-        manifest = {item.get("id"): item.get("href") for item in root.findall(".//opf:item", ns)}
-        if not manifest: manifest = {item.get("id"): item.get("href") for item in root.findall(".//item")}
-        spine_ids = [ir.get("idref") for ir in root.findall(".//opf:itemref", ns)]
-        if not spine_ids: spine_ids = [ir.get("idref") for ir in root.findall(".//itemref")]
-        opf_dir = os.path.dirname(opf_path)
-        return [os.path.relpath(os.path.join(opf_dir, manifest[sid]), base_dir) for sid in spine_ids if sid in manifest]
+        # 流式解析，一次遍历同时收集 manifest 与 spine，按本地名匹配，带不带 OPF 命名空间都能识别
+        manifest, spine_ids = {}, []
+        for _, el in ET.iterparse(io.BytesIO(epub[opf_name]), events=("end",)):
+            local = el.tag.rsplit('}', 1)[-1]
+            if local == "item": manifest[el.get("id")] = el.get("href")
+            elif local == "itemref": spine_ids.append(el.get("idref"))
+            el.clear()  # 处理完即释放，不保留整棵树
+        opf_dir = posixpath.dirname(opf_name)
+        return [posixpath.normpath(posixpath.join(opf_dir, manifest[sid])) for sid in spine_ids if sid in manifest]
     except: return []
 
-def extract_edition_date(base_dir, ordered_files):
-    date_pattern = re.compile(r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(?:st|nd|rd|th)?\s+20\d{2}', re.IGNORECASE)
+def extract_edition_date(epub, ordered_files):
     for fname in ordered_files[:5]:
-        path = os.path.join(base_dir, fname)
         try:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                m = date_pattern.search(BeautifulSoup(f.read(), "html.parser").get_text(" ", strip=True))
-                if m: return m.group(0)
+            # 只为找一个日期，不必建 DOM：去掉标签、还原实体后直接匹配
+            m = DATE_RE.search(unescape(TAG_RE.sub(" ", epub[fname].decode("utf-8", "replace"))))
+            if m: return m.group(0)
         except: continue
     return ""
 
-def parse_html_file(filepath, current_section, css_filename):
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        soup = BeautifulSoup(f.read(), "html.parser")
-    body = soup.find("body")
-    if not body: return [], current_section
+def element_text(el):
+    """元素的全部文本：逐段去掉首尾空白后直接拼接 (与原 get_text(strip=True) 的结果一致)"""
+    return "".join(t for t in (t.strip() for t in el.itertext()) if t)
 
-    articles = []
-    last_found_rubric = "" 
+def parse_html_file(data):
+    """解析单个 HTML 文件 (原始 bytes)，按文档顺序返回 (类型, ...) 事件列表，供 build_articles 回放"""
+    try:
+        doc = lxml.html.document_fromstring(data, parser=HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return []
+    body = doc.find("body")
+    if body is None: return []
+
+    events = []
 
-    for tag in body.find_all(True):
-        cls_list = tag.get("class", [])
-        if isinstance(cls_list, str): cls_list = [cls_list]
-        cls = " ".join(cls_list).lower()
+    for tag in body.iterdescendants():
+        if not isinstance(tag.tag, str): continue  # 跳过注释/处理指令
+        cls = tag.get("class") or ""
         
         is_section = False
-        if tag.name == "h2":
-            txt = tag.get_text(strip=True)
-            if any(x in cls for x in ["section", "department", "part", "header"]):
+        # h2 的文本只取一次，判断与事件共用
+        txt = element_text(tag) if tag.tag == "h2" else None
+        if tag.tag == "h2":
+            if cls and SECTION_CLASS_RE.search(cls):
                 is_section = True
             elif txt and len(txt) < 30 and txt.isupper():
                 is_section = True
                 
         if is_section:
-            current_section = tag.get_text(strip=True)
-            last_found_rubric = "" 
+            events.append(("section", txt))
             continue
 
-        is_rubric = any(x in cls for x in ["rubric", "kicker", "teaser", "flytitle", "deck", "subhead"])
-        if not is_rubric and tag.name == "h2":
-            txt = tag.get_text(strip=True)
+        is_rubric = bool(cls) and RUBRIC_CLASS_RE.search(cls) is not None
+        if not is_rubric and tag.tag == "h2":
             if txt and (len(txt) < 100 or "|" in txt):
                 is_rubric = True
                 
         if is_rubric:
-            last_found_rubric = tag.get_text(strip=True)
+            events.append(("rubric", txt if txt is not None else element_text(tag)))
             continue
 
-        if tag.name == "h1":
-            title = tag.get_text(strip=True)
+        if tag.tag == "h1":
+            title = element_text(tag)
             if not title: continue
 
+            # tostring 默认带上 tail，节点之间的文字不会丢
+            content_nodes = [tag]
+            for sib in tag.itersiblings():
+                if sib.tag in ("h1", "h2"): break
+                content_nodes.append(sib)
+
+            for node in content_nodes:
+                if isinstance(node.tag, str): rewrite_image_srcs(node)
+            content_html = "".join(lxml.html.tostring(x, encoding="unicode") for x in content_nodes)
+            events.append(("article", title, content_html))
+
+    return events
+
+def rewrite_image_srcs(node):
+    """直接在 DOM 上把图片地址改成 ../images/<文件名> (对应 copy_images 的输出)，省去对序列化结果的正则扫描"""
+    for el in node.iter():
+        for attr, value in el.attrib.items():
+            # 与原先的 src= 正则一致：src / data-src 等属性，且值以图片扩展名结尾
+            if attr.endswith("src") and value.lower().endswith(IMAGE_EXTS):
+                el.set(attr, "../images/" + posixpath.basename(value))
+
+def build_articles(events, current_section, css_filename, slug_counts, seen_bodies):
+    """按顺序回放 parse_html_file 的事件：维护栏目/Rubric 状态，渲染允许栏目的文章页 (由 main 统一写出)"""
+    articles = []
+    last_found_rubric = "" 
+    # 栏目名的清理结果与是否允许，只在栏目切换时算一次
+    clean_sec = current_section.strip()
+    section_allowed = clean_sec.lower() in ALLOWED_SECTIONS
+
+    for event in events:
+        if event[0] == "section":
+            current_section = event[1]
             clean_sec = current_section.strip()
-            clean_rub = last_found_rubric.strip()
-            
-            if clean_rub:
-                if "|" in clean_rub:
-                    rub_parts = [p.strip() for p in clean_rub.split("|", 1)]
-                    if rub_parts[0].lower() == clean_sec.lower():
-                        header_display = clean_rub
-                    else:
-                        header_display = f"{clean_sec} | {clean_rub}"
-                elif clean_rub.lower().startswith(clean_sec.lower()):
+            section_allowed = clean_sec.lower() in ALLOWED_SECTIONS
+            last_found_rubric = "" 
+            continue
+
+        if event[0] == "rubric":
+            last_found_rubric = event[1]
+            continue
+
+        _, title, content_html = event
+
+        clean_rub = last_found_rubric.strip()
+        
+        if clean_rub:
+            # 小写形式各算一次，供下面的比较共用
+            sec_lc, rub_lc = clean_sec.lower(), clean_rub.lower()
+            if "|" in clean_rub:
+                if rub_lc.split("|", 1)[0].strip() == sec_lc:
                     header_display = clean_rub
-                elif clean_rub.lower() != clean_sec.lower():
-                    header_display = f"{clean_sec} | {clean_rub}"
                 else:
-                    header_display = clean_sec
+                    header_display = f"{clean_sec} | {clean_rub}"
+            elif rub_lc.startswith(sec_lc):
+                header_display = clean_rub
+            elif rub_lc != sec_lc:
+                header_display = f"{clean_sec} | {clean_rub}"
             else:
                 header_display = clean_sec
+        else:
+            header_display = clean_sec
 
-            fly_title_html = f'<div class="fly-title">{header_display}</div>'
-            
-            content_nodes = [tag]
-            for sib in tag.next_siblings:
-                if getattr(sib, "name", None) in ["h1", "h2"]: break
-                content_nodes.append(sib)
+        fly_title_html = f'<div class="fly-title">{header_display}</div>'
+        article_html = fly_title_html + content_html
 
-            article_html = fly_title_html + "".join(str(x) for x in content_nodes)
-            article_html = re.sub(
-                r'src=["\']([^"\']*?/)?([^/"\']+\.(jpg|jpeg|png|gif|svg|webp))["\']', 
-                r'src="../images/\2"', 
-                article_html, 
-                flags=re.IGNORECASE
-            )
+        if len(article_html) < 200: continue
 
-            if len(article_html) < 200: continue
-            
-            slug = re.sub(r"[^\w\s-]", "", title).replace(" ", "-").lower()[:80]
-            if os.path.exists(f"output/articles/{slug}.html"): slug = f"{slug}-{len(articles)}"
-            path = f"articles/{slug}.html"
-            
-            write_article(path, article_html, title, css_filename)
-            articles.append({"section": current_section, "title": title, "path": path})
+        # 不在 ALLOWED_SECTIONS 的文章在写盘前就丢弃 (仍算作一篇，照常清空 Rubric)
+        if not section_allowed:
             last_found_rubric = ""
+            continue
+
+        # 同一篇文章在 EPUB 里出现两次 (例如挂在两个目录项下) 时只保留第一次
+        fingerprint = content_fingerprint(content_html)
+        if fingerprint in seen_bodies:
+            last_found_rubric = ""
+            continue
+        seen_bodies.add(fingerprint)
+        
+        path = f"articles/{make_slug(title, slug_counts)}.html"
+        
+        html = render_article(article_html, title, css_filename)
+        articles.append({"section": current_section, "title": title, "path": path, "html": html})
+        last_found_rubric = ""
 
     return articles, current_section
 
-def write_article(path, html_content, title, css_filename):
+def content_fingerprint(content_html):
+    """合并空白后 (保留标签与属性，图片不同即视为不同文章) 取 64 位 blake2b 摘要，作为正文去重的指纹"""
+    text = " ".join(content_html.split())
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+def make_slug(title, slug_counts):
+    """由标题生成文件名；重名时按出现次数追加 -1、-2 ... (计数器 O(1) 取号)"""
+    base = NON_SLUG_RE.sub("", title).replace(" ", "-").lower()[:80]
+    n = slug_counts.get(base, 0)
+    slug = base if n == 0 else f"{base}-{n}"
+    while n and slug in slug_counts:  # 加后缀后恰好撞上别的标题生成的 slug
+        n += 1
+        slug = f"{base}-{n}"
+    slug_counts[base] = n + 1
+    slug_counts.setdefault(slug, 1)
+    return slug
+
+def render_article(html_content, title, css_filename):
     css_link = f'<link rel="stylesheet" href="../css/{css_filename}" type="text/css"/>' if css_filename else ""
-    html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>{title}</title>
-{css_link}
-<style>
-    body {{ max-width: 800px; margin: 0 auto; padding: 30px 20px; font-family: Georgia, serif; background-color: #fdfdfd; color: #111; line-height: 1.6; }}
-    img {{ max-width: 100%; height: auto; display: block; margin: 25px auto; }}
-    .fly-title {{ 
-        font-size: 0.95em; 
-        color: #e3120b; 
-        margin-bottom: 15px;
-        border-bottom: 1px solid #ddd;
-        padding-bottom: 8px;
-        font-family: sans-serif;
-        font-weight: bold;
-    }}
-    h1 {{ font-size: 2.2em; line-height: 1.2; margin: 20px 0; color: #000; }}
-</style>
-</head>
-<body class="article">
-<div class="main-content">{html_content}</div>
-</body>
-</html>"""
-    with open(f"output/{path}", "w", encoding="utf-8") as f: f.write(html)
+    return ARTICLE_TEMPLATE.format(title=title, css_link=css_link, body=html_content)
 
 def generate_index(articles, edition_date):
     date_html = f'<span class="edition-date">{edition_date}</span>' if edition_date else ""
-    html = f"""<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<title>The Economist</title>
-<style>
-    body {{ font-family: sans-serif; max-width: 750px; margin: 0 auto; padding: 20px; background-color: #f8f9fa; }}
-    h1 {{ text-align: center; color: #e3120b; font-family: Georgia, serif; margin-bottom: 40px; font-size: 2.4em; }}
-    .edition-date {{ display: block; font-size: 0.6em; color: #666; margin-top: 10px; font-weight: normal; }}
-    h2.section-header {{ background: #2c2c2c; color: #fff; padding: 12px 15px; margin-top: 50px; font-size: 1.2em; text-transform: uppercase; border-radius: 4px; }}
-    div.article-link {{ margin: 12px 0; padding: 20px; background: #fff; border-radius: 4px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); border-left: 5px solid transparent; }}
-    div.article-link:hover {{ border-left-color: #e3120b; transform: translateY(-2px); }}
-    a {{ text-decoration: none; color: #111; font-weight: bold; font-size: 1.15em; display: block; }}
-</style>
-</head>
-<body>
-<h1>The Economist {date_html}</h1>
-"""
+    parts = [INDEX_HEAD, f"<h1>The Economist {date_html}</h1>\n"]
     current_section = None
     for a in articles:
         if a["section"] != current_section:
             current_section = a["section"]
-            html += f'<h2 class="section-header">{current_section}</h2>'
-        html += f'<div class="article-link"><a href="{a["path"]}">{a["title"]}</a></div>'
-    html += "</body></html>"
-    with open("output/index.html", "w", encoding="utf-8") as f: f.write(html)
+            parts.append(f'<h2 class="section-header">{current_section}</h2>')
+        parts.append(f'<div class="article-link"><a href="{a["path"]}">{a["title"]}</a></div>')
+    parts.append("</body></html>")
+    write_output("output/index.html", "".join(parts))
+
+def write_output(path, html):
+    """一次性编码为 UTF-8 后以二进制写出，跳过文本模式的换行转换"""
+    with open(path, "wb") as f: f.write(html.encode("utf-8"))
 
 if __name__ == "__main__":
     main()